@@ -12,9 +12,195 @@
 
 import re
 import os
-import configparser
+import sys
+import mmap
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
-from typing import List
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+
+# Регулярные выражения компилируются один раз при загрузке модуля:
+# функции ниже вызываются для каждой строки документа, и повторный поиск
+# шаблона во внутреннем кэше re на каждом вызове заметно замедляет обработку.
+
+# Преобразования начала строки описываются таблицей: имя -> шаблон.
+# Шаблоны объединяются в одну альтернативу, привязанную к началу строки,
+# а обработчик (_LINE_START_HANDLERS) выбирается по имени сработавшей группы.
+_HEADER_PATTERN = r'#{1,6}\s+(?P<header_text>.+)$'
+_CHECKLIST_PATTERN = r'(?P<checklist_marker>\s*-)\s*\[[ xX]\]\s*'
+
+# Жирный текст с двоеточием в начале элемента списка: двоеточие внутри **
+# ("**Текст:**") или снаружи ("**Текст**:"). Вариант "внутри" стоит первым
+# и выигрывает, если подходят оба.
+_BOLD_COLON_PATTERN = (
+    r'(?P<bold_prefix>\s*(?:-|\d+\.)\s+)'
+    r'\*\*(?:(?P<bold_inside>[^*]+):\*\*|(?P<bold_outside>[^*]+)\*\*:)\s*(?P<bold_rest>.+)$'
+)
+
+# Код с разделителем (тире, двоеточие, дефис) в начале элемента списка.
+# После пробелов идёт ровно один символ-разделитель, поэтому варианты не
+# пересекаются; _CODE_SEPARATORS задаёт, как он записывается в результат.
+_CODE_SEPARATOR_PATTERN = (
+    r'(?P<code_prefix>\s*(?:-|\d+\.)\s+)'
+    r'`(?P<code_text>[^`]+)`\s*(?P<code_separator_char>[—:\-])\s*(?P<code_rest>.+)$'
+)
+_CODE_SEPARATORS = {'—': ' — ', ':': ': ', '-': ' - '}
+
+
+def _fused(*patterns: Tuple[str, str]) -> re.Pattern:
+    """Объединяет именованные шаблоны в одну альтернативу от начала строки"""
+    branches = '|'.join(f'(?P<{name}>{pattern})' for name, pattern in patterns)
+    return re.compile(f'^(?:{branches})')
+
+
+# Отдельные преобразования начала строки (для публичных функций ниже)
+_HEADER_RE = _fused(('header', _HEADER_PATTERN))
+_CHECKLIST_RE = _fused(('checklist', _CHECKLIST_PATTERN))
+_BOLD_COLON_RE = _fused(('bold_colon', _BOLD_COLON_PATTERN))
+_CODE_SEPARATOR_RE = _fused(('code_separator', _CODE_SEPARATOR_PATTERN))
+_LIST_ITEM_RE = _fused(('bold_colon', _BOLD_COLON_PATTERN), ('code_separator', _CODE_SEPARATOR_PATTERN))
+
+# Все преобразования начала строки в порядке их применения: одна попытка
+# сопоставления вместо отдельного прохода на каждое преобразование
+_LINE_START_RE = _fused(
+    ('header', _HEADER_PATTERN),
+    ('checklist', _CHECKLIST_PATTERN),
+    ('bold_colon', _BOLD_COLON_PATTERN),
+    ('code_separator', _CODE_SEPARATOR_PATTERN),
+)
+
+# Жирный текст (**текст**) и курсив (*текст*)
+_BOLD_RE = re.compile(r'\*\*([^*]+)\*\*')
+_ITALIC_RE = re.compile(r'(?<!\*)\*(?!\*)([^*]+)\*(?!\*)')
+
+# Inline код (`текст`)
+_INLINE_CODE_RE = re.compile(r'`([^`]+)`')
+
+# Распространённые английские слова, которые НЕ считаются техническими терминами
+_COMMON_WORDS = frozenset({
+    'is', 'are', 'was', 'were', 'be', 'been', 'being',
+    'and', 'or', 'not', 'but', 'if', 'the', 'a', 'an',
+    'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by',
+    'as', 'it', 'this', 'that', 'from', 'all', 'can',
+    'will', 'would', 'should', 'could', 'may', 'might',
+    'do', 'does', 'did', 'have', 'has', 'had',
+    'get', 'set', 'use', 'make', 'take', 'go', 'see',
+    'new', 'old', 'first', 'last', 'next', 'one', 'two',
+    'when', 'where', 'why', 'how', 'what', 'which',
+    'some', 'any', 'many', 'much', 'few', 'more', 'most',
+    'only', 'just', 'also', 'even', 'well', 'way', 'back',
+    'time', 'year', 'work', 'part', 'case', 'over', 'than',
+    'able', 'data', 'into', 'then', 'them', 'each', 'such',
+})
+
+# Технические термины: snake_case и латинские слова из 4+ букв.
+# Исключения встроены в шаблон негативной проверкой вперёд, поэтому
+# распространённые слова отсеивает сам движок, без вызова Python-функции
+# на каждое найденное слово.
+_SNAKE_CASE_PATTERN = r'(?<![*])\b([a-z][a-z0-9]*(?:_[a-z0-9]+)+)\b(?![*])'
+_TECH_WORD_PATTERN = (
+    r'(?<![-*])\b(?!(?:'
+    + '|'.join(sorted(_COMMON_WORDS, key=len, reverse=True))
+    + r')\b)([a-z]{4,})\b(?![*])'
+)
+
+# Оба вида терминов одним проходом: snake_case (группа 1) или слово (группа 2).
+# Слово не может начаться или закончиться внутри snake_case (там нет границы
+# \b), поэтому результат тот же, что у двух последовательных замен
+_TECH_TERM_RE = re.compile(_SNAKE_CASE_PATTERN + '|' + _TECH_WORD_PATTERN)
+
+# Изображение ![alt](path) с путём в отдельной группе
+_IMAGE_PATH_RE = re.compile(r'(!\[[^\]]+\]\()([^\)]+)(\))')
+
+# Эмодзи в начале элемента списка (с опциональным variation selector \uFE0F)
+_EMOJI_LIST_RE = re.compile(
+    r'^(\s*(?:-|\d+\.)\s+)([\U0001F300-\U0001F9FF\U0001F600-\U0001F64F\U0001F680-\U0001F6FF'
+    r'\U00002600-\U000027BF\U0001F1E0-\U0001F1FF\U0001F900-\U0001F9FF\U0001FA70-\U0001FAFF]'
+    r'[\uFE0F]?)\s+(.+)$'
+)
+
+# Простые HTML-теги форматирования (в любом регистре): содержимое в группе 1
+_HTML_B_RE = re.compile(r'<b>([^<]+)</b>', re.IGNORECASE)
+_HTML_I_RE = re.compile(r'<i>([^<]+)</i>', re.IGNORECASE)
+_HTML_STRONG_RE = re.compile(r'<strong>([^<]+)</strong>', re.IGNORECASE)
+_HTML_EM_RE = re.compile(r'<em>([^<]+)</em>', re.IGNORECASE)
+
+# Прочие простые парные теги <tag>текст</tag>: содержимое в группе 2
+_HTML_SIMPLE_TAG_RE = re.compile(r'<([a-z]+)>([^<]+)</\1>', re.IGNORECASE)
+
+# Те же пять шаблонов одной альтернативой в порядке применения; имя
+# сработавшей группы выбирает разметку из _HTML_TAG_MARKUP
+_HTML_TAG_RE = re.compile(
+    r'(?P<b><b>(?P<b_text>[^<]+)</b>)'
+    r'|(?P<i><i>(?P<i_text>[^<]+)</i>)'
+    r'|(?P<strong><strong>(?P<strong_text>[^<]+)</strong>)'
+    r'|(?P<em><em>(?P<em_text>[^<]+)</em>)'
+    r'|(?P<tag><(?P<tag_name>[a-z]+)>(?P<tag_text>[^<]+)</(?P=tag_name)>)',
+    re.IGNORECASE
+)
+_HTML_TAG_MARKUP = {'b': '**', 'i': '*', 'strong': '**', 'em': '*', 'tag': ''}
+
+# Теги <details>, </details>, <summary>, </summary> (в любом регистре).
+# Все четыре тега ищутся одним проходом по строке. Регистр не учитывается только
+# у латинских букв (re.ASCII): похожие не-ASCII символы, например знак
+# Кельвина "K", частью тега не считаются.
+_DETAILS_TAG_RE = re.compile(r'<(/?)(details|summary)>', re.IGNORECASE | re.ASCII)
+
+# Удаление самих тегов из строки (в любом регистре)
+_DETAILS_OPEN_RE = re.compile(r'<details>', re.IGNORECASE)
+_SUMMARY_OPEN_RE = re.compile(r'<summary>', re.IGNORECASE)
+_SUMMARY_CLOSE_RE = re.compile(r'</summary>', re.IGNORECASE)
+
+# Заголовки "Показать ответ/решение/результат", оставшиеся от <summary>
+_SHOW_ANSWER_RE = re.compile(r'^[👁️\s]*Показать\s+(ответ|решение|результат)', re.IGNORECASE)
+
+# Markdown-ссылки одним сканированием. Первые две ветки (без групп) находят
+# ссылки, которые нужно оставить как есть: изображения ![alt](url) и ссылки на
+# файлы изображений. Третья ветка - обычная ссылка: группа 1 - текст, группа 2 -
+# URL без протокола. Регистр расширения не учитывается только у латинских букв
+# (?ai): ".PNG" - изображение, а не-ASCII символы, похожие на латиницу, - нет.
+_MARKDOWN_LINK_RE = re.compile(
+    r'!\[[^\]]+\]\([^)]+\)'
+    r'|\[[^\]]+\]\([^)]*\.(?ai:png|jpe?g|gif|svg|webp|bmp)\)'
+    r'|\[([^\]]+)\]\((?=[^)])(?:https?://)?([^)]*)\)'
+)
+
+# Голый URL с протоколом
+_BARE_URL_RE = re.compile(r'https?://([^\s)]+)')
+
+# Ограничитель блока кода: ``` после необязательных пробелов
+_FENCE_RE = re.compile(r'\s*```')
+
+# То же для текста из нескольких строк: ищет все ограничители за один проход
+# (пробелы перед ``` берутся только из той же строки)
+_FENCE_LINE_RE = re.compile(r'^[^\S\n]*```', re.MULTILINE)
+
+# Markdown-цитата: строка, начинающаяся с "> "
+_BLOCKQUOTE_LINE_RE = re.compile(r'^\s*>\s+')
+_BLOCKQUOTE_PREFIX_RE = re.compile(r'^(\s*>\s+)+')
+
+# Признаки строки, которую может изменить хотя бы одно построчное преобразование:
+# символы разметки и операторов, латиница в нижнем регистре (технические
+# термины, протоколы URL) и маркер нумерованного списка (эмодзи после номера).
+# Строки без них (обычный русский текст) проходят конвейер без изменений.
+_NEEDS_PROCESSING_RE = re.compile(r'[*`#\[<>!?\-a-z]|^\s*\d+\.\s')
+
+# Операторы, которые editor.js может принять за разметку
+# Все операторы одной альтернативой (->> раньше ->). Хвост (пробел или тире)
+# проверяется просмотром вперёд и не поглощается, поэтому пробел после
+# оператора может служить началом для следующего оператора.
+_OPERATOR_RE = re.compile(
+    r'(\s|^)('
+    r'->>'      # двойная стрелка
+    r'|->'      # стрелка
+    r'|@>'      # оператор содержания
+    r'|\?'      # оператор существования
+    r'|<='      # меньше или равно
+    r'|>='      # больше или равно
+    r'|!='      # не равно
+    r')(?=\s*—|\s)'
+)
 
 
 class ConfigManager:
@@ -25,6 +211,8 @@ class ConfigManager:
     и другими параметрами скрипта упрощения Markdown файлов.
     """
     
+    __slots__ = ('config_file', 'config', '_dirs_cache', '_encoding')
+    
     def __init__(self, config_file: str = 'ss.ini'):
         """
         Инициализация менеджера конфигурации.
@@ -33,7 +221,12 @@ class ConfigManager:
             config_file: Путь к файлу конфигурации
         """
         self.config_file = Path(config_file)
+        # configparser нужен только здесь - импорт не замедляет загрузку модуля
+        # в рабочих процессах пула
+        import configparser
         self.config = configparser.ConfigParser()
+        self._dirs_cache = None
+        self._encoding = None
         
     def load_config(self) -> bool:
         """
@@ -49,6 +242,9 @@ class ConfigManager:
             
         try:
             self.config.read(self.config_file, encoding='utf-8')
+            # Конфигурация изменилась - сбрасываем кэш
+            self._dirs_cache = None
+            self._encoding = None
             return True
         except Exception as e:
             print(f"❌ Ошибка чтения конфигурации: {e}")
@@ -59,38 +255,170 @@ class ConfigManager:
         Получает список пар (исходная_директория, целевая_директория) для упрощения.
         
         Ищет пары с суффиксом '_simplify_source' и '_simplify_target'.
+        Результат кэшируется до следующего вызова load_config().
         
         Returns:
             List[tuple]: Список кортежей (source, target)
         """
+        if self._dirs_cache is not None:
+            return self._dirs_cache
+        
         if not self.config.has_section('directories'):
             print("❌ Секция [directories] не найдена в конфигурации!")
             return []
         
+        # Читаем секцию один раз: все значения в словарь, дальше только поиск по нему
+        options = dict(self.config['directories'].items())
         directories = []
         
         # Получаем все пары simplify_source-simplify_target из конфигурации
-        for key, value in self.config['directories'].items():
+        for key, value in options.items():
             if key.endswith('_simplify_source'):
                 # Ищем соответствующую simplify_target директорию
                 target_key = key.replace('_simplify_source', '_simplify_target')
-                if target_key in self.config['directories']:
-                    source_path = Path(value)
-                    target_path = Path(self.config['directories'][target_key])
-                    directories.append((source_path, target_path))
+                if target_key in options:
+                    directories.append((Path(value), Path(options[target_key])))
         
+        self._dirs_cache = directories
         return directories
     
     def get_encoding(self) -> str:
         """
         Получает кодировку из конфигурации.
+        Значение кэшируется до следующего вызова load_config().
         
         Returns:
             str: Кодировка файлов (по умолчанию 'utf-8')
         """
-        if self.config.has_section('settings') and 'encoding' in self.config['settings']:
-            return self.config['settings']['encoding']
-        return 'utf-8'
+        if self._encoding is None:
+            if self.config.has_section('settings') and 'encoding' in self.config['settings']:
+                self._encoding = self.config['settings']['encoding']
+            else:
+                self._encoding = 'utf-8'
+        return self._encoding
+
+
+def _list_kind(line: str) -> Optional[Tuple[str, int]]:
+    """
+    Определяет, является ли строка элементом списка
+    
+    Элемент списка: необязательный отступ, маркер "-" или номер "1." и хотя
+    бы один пробельный символ после него. Начало строки разбирается
+    посимвольно: функция вызывается для каждой строки документа.
+    
+    Параметры:
+        line: Строка markdown
+        
+    Возвращает:
+        Пару (тип, позиция_текста) для элемента списка, где тип - 'bullet'
+        для "- текст" или 'numbered' для "1. текст", а позиция_текста -
+        индекс первого символа после маркера и следующих за ним пробелов.
+        None, если строка не является элементом списка.
+    """
+    n = len(line)
+    i = 0
+    # Пропускаем отступ
+    while i < n and line[i].isspace():
+        i += 1
+    if i == n:
+        return None
+    
+    if line[i] == '-':
+        kind = 'bullet'
+        i += 1
+    else:
+        # Номер пункта: цифры и точка
+        start = i
+        while i < n and line[i].isdecimal():
+            i += 1
+        if i == start or i == n or line[i] != '.':
+            return None
+        kind = 'numbered'
+        i += 1
+    
+    # После маркера обязателен пробельный символ
+    if i == n or not line[i].isspace():
+        return None
+    i += 1
+    while i < n and line[i].isspace():
+        i += 1
+    return kind, i
+
+
+def _replace_header(match: re.Match) -> str:
+    """Заголовок любого уровня → заголовок 3 уровня"""
+    return f"### {match.group('header_text')}"
+
+
+def _replace_checklist(match: re.Match) -> str:
+    """Чекбокс убирается, маркер списка и текст после чекбокса остаются"""
+    return f"{match.group('checklist_marker')} {match.string[match.end():]}"
+
+
+def _replace_bold_colon(match: re.Match) -> str:
+    """Убирает ** вокруг текста с двоеточием, двоеточие остаётся после текста"""
+    text = match.group('bold_inside')
+    if text is None:
+        text = match.group('bold_outside')
+    return f"{match.group('bold_prefix')}{text}: {match.group('bold_rest')}"
+
+
+def _replace_code_separator(match: re.Match) -> str:
+    """Убирает backticks вокруг кода, разделитель записывается с пробелами"""
+    separator = _CODE_SEPARATORS[match.group('code_separator_char')]
+    return f"{match.group('code_prefix')}{match.group('code_text')}{separator}{match.group('code_rest')}"
+
+
+# Обработчики преобразований начала строки по имени группы
+_LINE_START_HANDLERS = {
+    'header': _replace_header,
+    'checklist': _replace_checklist,
+    'bold_colon': _replace_bold_colon,
+    'code_separator': _replace_code_separator,
+}
+
+# Какие преобразования ещё могут сработать на результате обработчика:
+# после снятия чекбокса - исправления элемента списка, после жирного
+# с двоеточием - код с разделителем
+_LINE_START_FOLLOW_UPS = {
+    'checklist': _LIST_ITEM_RE,
+    'bold_colon': _CODE_SEPARATOR_RE,
+}
+
+
+def _apply_line_start(pattern: re.Pattern, line: str) -> str:
+    """Применяет одно преобразование начала строки из шаблона, собранного _fused()"""
+    match = pattern.match(line)
+    if match is None:
+        return line
+    return _LINE_START_HANDLERS[match.lastgroup](match)
+
+
+def fix_line_start(line: str) -> str:
+    """
+    Выполняет все преобразования начала строки за одно сопоставление
+    
+    Эквивалентно последовательному вызову normalize_headers, remove_checklists,
+    fix_bold_colon_in_lists и fix_code_with_dash_in_lists: обработчик
+    выбирается по имени сработавшей группы _LINE_START_RE, а повторное
+    сопоставление выполняется только когда результат может подойти под
+    следующее преобразование (_LINE_START_FOLLOW_UPS).
+    
+    Параметры:
+        line: Строка markdown
+        
+    Возвращает:
+        Строку после преобразований начала строки
+    """
+    pattern = _LINE_START_RE
+    while pattern is not None:
+        match = pattern.match(line)
+        if match is None:
+            break
+        name = match.lastgroup
+        line = _LINE_START_HANDLERS[name](match)
+        pattern = _LINE_START_FOLLOW_UPS.get(name)
+    return line
 
 
 def normalize_headers(line: str) -> str:
@@ -103,12 +431,7 @@ def normalize_headers(line: str) -> str:
     Возвращает:
         Преобразованную строку с заголовком уровня 3
     """
-    # Проверяем, является ли строка заголовком
-    header_match = re.match(r'^(#{1,6})\s+(.+)$', line)
-    if header_match:
-        # Всегда делаем заголовок 3 уровня
-        return f"### {header_match.group(2)}"
-    return line
+    return _apply_line_start(_HEADER_RE, line)
 
 
 def remove_checklists(line: str) -> str:
@@ -124,8 +447,7 @@ def remove_checklists(line: str) -> str:
     # Убираем чекбоксы из списков
     # - [ ] текст -> - текст
     # - [x] текст -> - текст
-    line = re.sub(r'^(\s*-)\s*\[([ xX])\]\s*', r'\1 ', line)
-    return line
+    return _apply_line_start(_CHECKLIST_RE, line)
 
 
 def simplify_mixed_formatting(line: str) -> str:
@@ -141,17 +463,38 @@ def simplify_mixed_formatting(line: str) -> str:
     Возвращает:
         Упрощенную строку
     """
+    if '*' not in line:
+        return line
+    
     # Проверяем наличие смешанного форматирования в одной строке
-    # Если есть и жирный (**) и курсив (*), удаляем всё форматирование
-    has_bold = bool(re.search(r'\*\*[^*]+\*\*', line))
-    has_italic = bool(re.search(r'(?<!\*)\*(?!\*)([^*]+)\*(?!\*)', line))
+    # Если есть и жирный (**) и курсив (*), удаляем всё форматирование.
+    # Один проход по сериям звёздочек: жирный - пара соседних серий длиной
+    # от 2 (как находит _BOLD_RE), курсив - пара соседних серий ровно из
+    # одной звёздочки (как находит _ITALIC_RE).
+    has_bold = has_italic = False
+    prev_run = 0
+    i = line.find('*')
+    n = len(line)
+    while i != -1:
+        j = i + 1
+        while j < n and line[j] == '*':
+            j += 1
+        run = j - i
+        if run >= 2 and prev_run >= 2:
+            has_bold = True
+        elif run == 1 and prev_run == 1:
+            has_italic = True
+        if has_bold and has_italic:
+            break
+        prev_run = run
+        i = line.find('*', j)
     
     if has_bold and has_italic:
         # Убираем всё форматирование
         # Сначала жирный текст
-        line = re.sub(r'\*\*([^*]+)\*\*', r'\1', line)
+        line = _BOLD_RE.sub(r'\1', line)
         # Потом курсив
-        line = re.sub(r'(?<!\*)\*(?!\*)([^*]+)\*(?!\*)', r'\1', line)
+        line = _ITALIC_RE.sub(r'\1', line)
     
     return line
 
@@ -173,22 +516,15 @@ def fix_bold_colon_in_lists(line: str) -> str:
     Возвращает:
         Исправленную строку
     """
-    # Паттерн 1: двоеточие ВНУТРИ ** (самый частый случай)
-    # Пример: "- **FUNCTION:** Вычисления..." или "1. **FUNCTION:** Вычисления..."
-    pattern1 = r'^(\s*(?:-|\d+\.)\s+)\*\*([^*]+):\*\*\s*(.+)$'
+    if '**' not in line:
+        return line
     
-    # Паттерн 2: двоеточие СНАРУЖИ **
+    # Вариант 1: двоеточие ВНУТРИ ** (самый частый случай)
+    # Пример: "- **FUNCTION:** Вычисления..." или "1. **FUNCTION:** Вычисления..."
+    # Вариант 2: двоеточие СНАРУЖИ **
     # Пример: "- **FUNCTION**: Вычисления..." или "1. **FUNCTION**: Вычисления..."
-    pattern2 = r'^(\s*(?:-|\d+\.)\s+)\*\*([^*]+)\*\*:\s*(.+)$'
-    
-    if re.match(pattern1, line):
-        # Убираем ** и оставляем двоеточие
-        line = re.sub(pattern1, r'\1\2: \3', line)
-    elif re.match(pattern2, line):
-        # Убираем ** и сохраняем двоеточие
-        line = re.sub(pattern2, r'\1\2: \3', line)
-    
-    return line
+    # Убираем ** и оставляем двоеточие
+    return _apply_line_start(_BOLD_COLON_RE, line)
 
 
 def fix_code_with_dash_in_lists(line: str) -> str:
@@ -208,86 +544,59 @@ def fix_code_with_dash_in_lists(line: str) -> str:
     Возвращает:
         Исправленную строку
     """
-    # Паттерн 1: с длинным тире (—)
-    # Пример: "- `RAISE NOTICE` — информация" или "1. `RAISE NOTICE` — информация"
-    pattern_dash = r'^(\s*(?:-|\d+\.)\s+)`([^`]+)`\s*—\s*(.+)$'
+    if '`' not in line:
+        return line
     
-    # Паттерн 2: с двоеточием
+    # Разделитель 1: длинное тире (—)
+    # Пример: "- `RAISE NOTICE` — информация" или "1. `RAISE NOTICE` — информация"
+    # Разделитель 2: двоеточие
     # Пример: "- `PRIMARY KEY` : уникальность" или "1. `PRIMARY KEY` : уникальность"
-    pattern_colon = r'^(\s*(?:-|\d+\.)\s+)`([^`]+)`\s*:\s*(.+)$'
-    
-    # Паттерн 3: с обычным дефисом + пробел (может быть спутан с тире)
+    # Разделитель 3: обычный дефис + пробел (может быть спутан с тире)
     # Пример: "- `код` - пояснение" или "1. `код` - пояснение"
-    pattern_hyphen = r'^(\s*(?:-|\d+\.)\s+)`([^`]+)`\s*-\s*(.+)$'
-    
-    if re.match(pattern_dash, line):
-        # Убираем backticks, сохраняем длинное тире
-        line = re.sub(pattern_dash, r'\1\2 — \3', line)
-    elif re.match(pattern_colon, line):
-        # Убираем backticks, сохраняем двоеточие
-        line = re.sub(pattern_colon, r'\1\2: \3', line)
-    elif re.match(pattern_hyphen, line):
-        # Убираем backticks, сохраняем дефис
-        line = re.sub(pattern_hyphen, r'\1\2 - \3', line)
-    
-    return line
+    # Убираем backticks, сохраняем разделитель
+    return _apply_line_start(_CODE_SEPARATOR_RE, line)
 
 
-def remove_bold_in_lists(line: str) -> str:
+def remove_bold_and_code_in_lists(line: str) -> str:
     """
-    Убирает ВСЁ жирное форматирование (**текст**) в списках
+    Убирает ВСЁ жирное форматирование (**текст**) и код (`текст`) в списках
     
-    Editor.js полностью теряет содержимое жирного текста в списках.
+    Editor.js полностью теряет содержимое жирного текста и backticks в списках.
     Примеры проблем:
     - "- Когда система **оптимальна**" → редактор видит только "Когда система"
     - "- 🔥 **70% проектов**" → редактор видит только "🔥"
     - "1. **Текст** в списке" → редактор видит только пустоту
+    - "- Убить запрос: `SELECT pg_terminate_backend(pid);`" → editor.js видит только "Убить запрос:"
+    - "- Используйте `DROP TABLE` осторожно" → editor.js видит только "Используйте осторожно"
+    - "1. `incident_id → analyst_id` (пояснение)" → editor.js теряет всё
     
-    Решение: убираем ** полностью в списках (маркированных И нумерованных).
+    Решение: убираем ** и ` полностью в списках (маркированных И нумерованных),
+    оставляя содержимое. Проверка на элемент списка выполняется один раз.
     
     Параметры:
         line: Строка markdown
         
     Возвращает:
-        Строку без жирного форматирования в списках
+        Строку без жирного форматирования и backticks в списках
     """
     # Проверяем, является ли строка элементом списка (маркированный или нумерованный)
     # Маркированный: - текст
     # Нумерованный: 1. текст, 2. текст и т.д.
-    if re.match(r'^\s*(-|\d+\.)\s+', line):
-        # Убираем ВСЁ жирное форматирование (**текст**)
-        line = re.sub(r'\*\*([^*]+)\*\*', r'\1', line)
-    
-    return line
-
-
-def remove_code_in_lists(line: str) -> str:
-    """
-    Убирает ВСЁ форматирование кода (`текст`) в списках
-    
-    Editor.js теряет содержимое внутри backticks в списках.
-    Примеры проблем:
-    - "- Убить запрос: `SELECT pg_terminate_backend(pid);`" → editor.js видит только "Убить запрос:"
-    - "- Используйте `DROP TABLE` осторожно" → editor.js видит только "Используйте осторожно"
-    - "1. `incident_id → analyst_id` (пояснение)" → editor.js теряет всё
+    if not _list_kind(line):
+        return line
     
-    Решение: убираем ` полностью в списках, оставляя содержимое.
+    # Убираем ВСЁ жирное форматирование (**текст**)
+    if '**' in line:
+        line = _BOLD_RE.sub(r'\1', line)
     
-    Параметры:
-        line: Строка markdown
-        
-    Возвращает:
-        Строку без backticks в списках
-    """
-    # Проверяем, является ли строка элементом списка (маркированный или нумерованный)
-    if re.match(r'^\s*(-|\d+\.)\s+', line):
-        # Убираем ВСЁ форматирование кода (`текст`)
-        line = re.sub(r'`([^`]+)`', r'\1', line)
+    # Убираем ВСЁ форматирование кода (`текст`)
+    if '`' in line:
+        line = _INLINE_CODE_RE.sub(r'\1', line)
     
     return line
 
 
-def unify_nested_list_types(lines: List[str]) -> List[str]:
+def _lists_stream(lines: Iterable[str]) -> Iterator[str]:
     """
     Унифицирует типы вложенных списков для совместимости с editor.js
     
@@ -307,29 +616,29 @@ def unify_nested_list_types(lines: List[str]) -> List[str]:
            1. Подпункт A    ← нумерованный (как родитель)
            2. Подпункт B
     
+    Работает потоково: каждая входная строка даёт ровно одну выходную.
+    
     Параметры:
-        lines: Список строк документа
+        lines: Строки документа
         
     Возвращает:
-        Обработанный список строк
+        Итератор обработанных строк
     """
-    result = []
     parent_type = None  # 'numbered' или 'bullet'
     parent_indent = 0   # Уровень отступа родителя
     nested_counter = 1  # Счётчик для вложенных нумерованных списков
     
-    for i, line in enumerate(lines):
+    for line in lines:
         # Определяем тип и отступ текущей строки
         stripped = line.lstrip()
         current_indent = len(line) - len(stripped)
         
         # Проверяем, является ли строка элементом списка
-        is_numbered = re.match(r'^\d+\.\s+', stripped)
-        is_bullet = re.match(r'^-\s+', stripped)
+        list_item = _list_kind(stripped)
         
-        if not is_numbered and not is_bullet:
+        if list_item is None:
             # Обычная строка (не список)
-            result.append(line)
+            yield line
             # Если отступ меньше родительского - сбрасываем контекст
             if current_indent <= parent_indent:
                 parent_type = None
@@ -340,41 +649,46 @@ def unify_nested_list_types(lines: List[str]) -> List[str]:
         # Это элемент списка
         if current_indent == 0 or current_indent <= parent_indent:
             # Это родительский элемент (нет отступа или новый уровень)
-            result.append(line)
+            yield line
             parent_indent = current_indent
             nested_counter = 1  # Сбрасываем счётчик для нового родителя
-            
-            if is_numbered:
-                parent_type = 'numbered'
-            elif is_bullet:
-                parent_type = 'bullet'
+            parent_type = list_item[0]
         else:
             # Это вложенный элемент (есть отступ)
             if parent_type is None:
                 # Нет родителя - оставляем как есть
-                result.append(line)
+                yield line
                 continue
             
-            # Извлекаем текст после маркера списка
-            if is_numbered:
-                text = re.sub(r'^\d+\.\s+', '', stripped)
-            elif is_bullet:
-                text = re.sub(r'^-\s+', '', stripped)
-            else:
-                text = stripped
+            # Текст после маркера списка (позиция уже найдена сканером)
+            text = stripped[list_item[1]:]
             
             # Преобразуем в тип родителя
             indent_spaces = ' ' * current_indent
             
             if parent_type == 'numbered':
                 # Родитель нумерованный → вложенный тоже нумерованный
-                result.append(f"{indent_spaces}{nested_counter}. {text}")
+                yield f"{indent_spaces}{nested_counter}. {text}"
                 nested_counter += 1
             else:
                 # Родитель маркированный → вложенный тоже маркированный
-                result.append(f"{indent_spaces}- {text}")
+                yield f"{indent_spaces}- {text}"
+
+
+def unify_nested_list_types(lines: List[str]) -> List[str]:
+    """
+    Унифицирует типы вложенных списков во всём документе (см. _lists_stream)
+    
+    Конвейер использует генератор напрямую; функция сохранена как
+    публичный интерфейс модуля для обработки готового списка строк.
     
-    return result
+    Параметры:
+        lines: Список строк документа
+        
+    Возвращает:
+        Обработанный список строк
+    """
+    return list(_lists_stream(lines))
 
 
 def remove_italic_in_lists(line: str) -> str:
@@ -393,10 +707,11 @@ def remove_italic_in_lists(line: str) -> str:
         Строку без курсива в нумерованных списках
     """
     # Проверяем, является ли строка нумерованным списком
-    if re.match(r'^\s*\d+\.\s+', line):
+    list_item = _list_kind(line)
+    if list_item and list_item[0] == 'numbered':
         # Убираем ВСЁ форматирование курсивом (*текст*)
         # Но НЕ трогаем markdown разделители типа * * *
-        line = re.sub(r'(?<!\*)\*(?!\*)([^*]+)\*(?!\*)', r'\1', line)
+        line = _ITALIC_RE.sub(r'\1', line)
     
     return line
 
@@ -417,8 +732,12 @@ def remove_inline_code_everywhere(line: str) -> str:
     Возвращает:
         Строку без inline backticks (backticks заменены на курсив)
     """
+    # Без backticks заменять нечего
+    if '`' not in line:
+        return line
+    
     # Пропускаем блоки кода (начинаются с ```)
-    if line.strip().startswith('```'):
+    if _FENCE_RE.match(line):
         return line
     
     # Пропускаем строки в таблицах (содержат | как разделители)
@@ -429,7 +748,7 @@ def remove_inline_code_everywhere(line: str) -> str:
     
     # Убираем inline backticks, заменяя на курсив для технических терминов
     # `текст` → *текст* (курсив вместо кода)
-    line = re.sub(r'`([^`]+)`', r'*\1*', line)
+    line = _INLINE_CODE_RE.sub(r'*\1*', line)
     
     return line
 
@@ -443,10 +762,7 @@ def wrap_technical_terms_in_italic_except_images(line: str) -> str:
     """
     # Проверяем, есть ли в строке изображение ![alt](path)
     # Если есть, обрабатываем строку по частям, исключая путь к изображению
-    pattern = r'(!\[[^\]]+\]\()([^\)]+)(\))'
-    
-    # Проверяем, содержит ли строка изображение
-    if re.search(pattern, line):
+    if _IMAGE_PATH_RE.search(line):
         # Разбиваем строку на части: до изображения, путь, после изображения
         def process_without_image_path(match):
             before_path = match.group(1)  # ![alt](
@@ -459,7 +775,7 @@ def wrap_technical_terms_in_italic_except_images(line: str) -> str:
             return before_processed + path + after_processed
         
         # Обрабатываем строку, защищая путь к изображению
-        line = re.sub(pattern, process_without_image_path, line)
+        line = _IMAGE_PATH_RE.sub(process_without_image_path, line)
         return line
     
     # Если нет изображений, обрабатываем как обычно
@@ -491,74 +807,36 @@ def wrap_technical_terms_in_italic(line: str) -> str:
     Возвращает:
         Строку с техническими терминами в курсиве
     """
+    stripped = line.strip()
+    
     # Пропускаем блоки кода
-    if line.strip().startswith('```'):
+    if stripped.startswith('```'):
         return line
     
     # Пропускаем строки таблиц (начинаются с | или содержат много |)
-    if line.strip().startswith('|') or line.count('|') > 2:
+    if stripped.startswith('|') or line.count('|') > 2:
         return line
     
     # Пропускаем уже обработанные строки (заголовки, горизонтальные линии)
-    if line.strip().startswith('#') or line.strip() == '---':
+    if stripped.startswith('#') or stripped == '---':
         return line
     
     # ВАЖНО: Пропускаем списки (маркированные и нумерованные)
     # В списках editor.js теряет форматирование, поэтому там все термины - просто текст
-    if re.match(r'^\s*(-|\d+\.)\s+', line):
+    if _list_kind(line):
         return line
     
+    # Один проход по строке для обоих паттернов (незаполненная группа
+    # подставляется пустой строкой):
     # Паттерн 1: snake_case термины (хотя бы один underscore)
     # Примеры: student_id, course_title, user_id
     # НЕ оборачиваем, если уже внутри * или **
-    
-    def wrap_snake_case(match):
-        word = match.group(1)
-        # Проверяем контекст - не находится ли уже внутри форматирования
-        # Это приближённая проверка, не идеальная
-        return f"*{word}*"
-    
-    # Ищем слова формата word_word (snake_case)
-    # Но НЕ трогаем, если перед словом * или **
-    line = re.sub(r'(?<![*])\b([a-z][a-z0-9]*(?:_[a-z0-9]+)+)\b(?![*])', wrap_snake_case, line)
-    
     # Паттерн 2: технические односложные термины (users, profiles, incidents и т.д.)
     # Только маленькие буквы, длина 4+ символов
-    # НЕ трогаем: распространённые английские слова
+    # НЕ трогаем: распространённые английские слова (_COMMON_WORDS)
     # НЕ трогаем: слова внутри составных слов (NULL-able)
-    
-    # Список исключений (обычные английские слова, которые НЕ нужно оборачивать)
-    common_words = {
-        'is', 'are', 'was', 'were', 'be', 'been', 'being',
-        'and', 'or', 'not', 'but', 'if', 'the', 'a', 'an',
-        'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by',
-        'as', 'it', 'this', 'that', 'from', 'all', 'can',
-        'will', 'would', 'should', 'could', 'may', 'might',
-        'do', 'does', 'did', 'have', 'has', 'had',
-        'get', 'set', 'use', 'make', 'take', 'go', 'see',
-        'new', 'old', 'first', 'last', 'next', 'one', 'two',
-        'when', 'where', 'why', 'how', 'what', 'which',
-        'some', 'any', 'many', 'much', 'few', 'more', 'most',
-        'only', 'just', 'also', 'even', 'well', 'way', 'back',
-        'time', 'year', 'work', 'part', 'case', 'over', 'than',
-        'able', 'data', 'into', 'then', 'them', 'each', 'such'
-    }
-    
-    # Находим латинские слова длиной 4+ символов
-    # Оборачиваем в курсив, если НЕ в списке исключений
-    # И НЕ внутри составного слова (после дефиса)
-    def replace_tech_term(match):
-        word = match.group(1)
-        if word.lower() in common_words:
-            return word  # Не трогаем распространённые слова
-        return f"*{word}*"
-    
-    # Паттерн: латинское слово (4+ буквы, только маленькие)
-    # НЕ после дефиса (чтобы не трогать NULL-able)
-    # НЕ внутри * или **
-    line = re.sub(r'(?<![-*])\b([a-z]{4,})\b(?![*])', replace_tech_term, line)
-    
-    return line
+    # НЕ трогаем: слова внутри * или **
+    return _TECH_TERM_RE.sub(r'*\1\2*', line)
 
 
 def fix_emoji_at_list_start(line: str) -> str:
@@ -581,9 +859,15 @@ def fix_emoji_at_list_start(line: str) -> str:
     # Проверяем, является ли строка элементом списка, начинающимся с эмодзи
     # Паттерн: начало строки, список (- или 1.), пробелы, эмодзи, опциональный variation selector, пробел, текст
     # Эмоджи определяем через диапазоны unicode + опциональный variation selector \uFE0F
-    emoji_pattern = r'^(\s*(?:-|\d+\.)\s+)([\U0001F300-\U0001F9FF\U0001F600-\U0001F64F\U0001F680-\U0001F6FF\U00002600-\U000027BF\U0001F1E0-\U0001F1FF\U0001F900-\U0001F9FF\U0001FA70-\U0001FAFF][\uFE0F]?)\s+(.+)$'
-    
-    match = re.match(emoji_pattern, line)
+    list_item = _list_kind(line)
+    if list_item is None:
+        return line
+    # Быстрая проверка первого символа после маркера: все диапазоны эмодзи
+    # начинаются с U+2600, поэтому для обычного текста регулярка не нужна
+    pos = list_item[1]
+    if pos == len(line) or ord(line[pos]) < 0x2600:
+        return line
+    match = _EMOJI_LIST_RE.match(line)
     if match:
         # Добавляем двоеточие после эмодзи для разделения
         line = f"{match.group(1)}{match.group(2)}: {match.group(3)}"
@@ -591,59 +875,95 @@ def fix_emoji_at_list_start(line: str) -> str:
     return line
 
 
-def process_details_blocks(lines: List[str]) -> List[str]:
+def _details_stream(lines: Iterable[str]) -> Iterator[str]:
     """
     Раскрывает блоки <details>/<summary>, удаляя теги и оставляя содержимое
     
     ВАЖНО: Также удаляет строки-заголовки типа "👁️ Показать ответ",
     которые остались от summary и теперь бессмысленны (нет возможности скрыть).
     
+    Работает потоково: строки читаются из итератора и выдаются по одной,
+    поэтому преобразование можно сцеплять с другими без промежуточных списков.
+    
     Параметры:
-        lines: Список строк документа
+        lines: Строки документа
         
     Возвращает:
-        Обработанный список строк
+        Итератор обработанных строк
     """
-    result = []
     in_details = False
     in_summary = False
     summary_content = ""  # Сохраняем содержимое summary для проверки
     
     for line in lines:
+        # Строка без тегов - добавляем как есть
+        if '<' not in line:
+            yield line
+            continue
+        
+        # Находим все теги details/summary за один проход по строке
+        has_details_open = has_details_close = False
+        has_summary_open = has_summary_close = False
+        for match in _DETAILS_TAG_RE.finditer(line):
+            is_closing = bool(match.group(1))
+            if match.group(2).lower() == 'details':
+                if is_closing:
+                    has_details_close = True
+                else:
+                    has_details_open = True
+            elif is_closing:
+                has_summary_close = True
+            else:
+                has_summary_open = True
+        
         # Начало блока details
-        if '<details>' in line.lower():
+        if has_details_open:
             in_details = True
             # Если на этой же строке есть текст, сохраняем его
-            clean_line = re.sub(r'<details>', '', line, flags=re.IGNORECASE)
+            clean_line = _DETAILS_OPEN_RE.sub('', line)
             if clean_line.strip():
-                result.append(clean_line)
+                yield clean_line
             continue
         
         # Тег summary - извлекаем содержимое, но НЕ добавляем в результат
-        if '<summary>' in line.lower():
+        if has_summary_open:
             in_summary = True
             # Извлекаем содержимое summary для анализа
-            clean_line = re.sub(r'<summary>', '', line, flags=re.IGNORECASE)
-            clean_line = re.sub(r'</summary>', '', clean_line, flags=re.IGNORECASE)
+            clean_line = _SUMMARY_OPEN_RE.sub('', line)
+            clean_line = _SUMMARY_CLOSE_RE.sub('', clean_line)
             summary_content = clean_line.strip()
             # НЕ добавляем в результат - эта строка будет удалена
             continue
         
         # Закрытие summary
-        if '</summary>' in line.lower():
+        if has_summary_close:
             in_summary = False
             summary_content = ""
             continue
         
         # Закрытие details
-        if '</details>' in line.lower():
+        if has_details_close:
             in_details = False
             continue
         
         # Обычная строка - добавляем как есть
-        result.append(line)
+        yield line
+
+
+def process_details_blocks(lines: List[str]) -> List[str]:
+    """
+    Раскрывает блоки <details>/<summary> во всём документе (см. _details_stream)
+    
+    Конвейер использует генератор напрямую; функция сохранена как
+    публичный интерфейс модуля для обработки готового списка строк.
     
-    return result
+    Параметры:
+        lines: Список строк документа
+        
+    Возвращает:
+        Обработанный список строк
+    """
+    return list(_details_stream(lines))
 
 
 def remove_show_answer_headers(line: str) -> str:
@@ -678,15 +998,23 @@ def remove_show_answer_headers(line: str) -> str:
         return line
     
     # Убираем жирное форматирование для проверки
-    clean = re.sub(r'\*\*([^*]+)\*\*', r'\1', stripped)
+    clean = _BOLD_RE.sub(r'\1', stripped)
     
     # Проверяем паттерны "Показать ..."
-    if re.match(r'^[👁️\s]*Показать\s+(ответ|решение|результат)', clean, re.IGNORECASE):
+    if _SHOW_ANSWER_RE.match(clean):
         return None  # Удаляем строку (возвращаем None, а не "")
     
     return line
 
 
+def _replace_markdown_link(match: re.Match) -> str:
+    """Замена для _MARKDOWN_LINK_RE: обычная ссылка → *текст (url)*"""
+    text = match.group(1)
+    if text is None:
+        return match.group(0)
+    return f'*{text} ({match.group(2)})*'
+
+
 def convert_markdown_links(line: str) -> str:
     """
     Преобразует markdown-ссылки в текст с URL в скобках для editor.js
@@ -709,36 +1037,13 @@ def convert_markdown_links(line: str) -> str:
     Возвращает:
         Строку с преобразованными ссылками: *текст (url)*
     """
-    # Список расширений изображений
-    image_extensions = ['.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp', '.bmp']
-    
-    # Паттерн для markdown-ссылок: [текст](url) или ![alt](url)
-    # НО пропускаем ссылки на изображения
-    def replace_link(match):
-        full_match = match.group(0)  # Вся ссылка [!text](url) или [text](url)
-        optional_bang = match.group(1)  # Группа 1: `!` или пусто
-        text = match.group(2)  # Группа 2: текст внутри []
-        url = match.group(3)  # Группа 3: URL внутри ()
-        
-        # Проверяем, является ли это изображением (начинается с !)
-        is_image = optional_bang == '!'
-        
-        # Проверяем, является ли URL путем к изображению
-        is_image_path = any(url.lower().endswith(ext) for ext in image_extensions)
-        
-        # Если это изображение (начинается с ! или путь к изображению), НЕ ОБРАБАТЫВАЕМ
-        if is_image or is_image_path:
-            return full_match  # Возвращаем как есть
-        
-        # Для обычных ссылок - преобразуем
-        # Убираем протокол из URL
-        url_clean = re.sub(r'^https?://', '', url)
-        return f'*{text} ({url_clean})*'
-    
-    # Паттерн: (!?) захватывает опциональный !, затем текст и URL
-    line = re.sub(r'(!?)\[([^\]]+)\]\(([^)]+)\)', replace_link, line)
+    # Любая ссылка содержит "](" - без него регулярку не запускаем
+    if '](' not in line:
+        return line
     
-    return line
+    # Изображения и ссылки на файлы изображений попадают в ветки без групп
+    # и возвращаются без изменений; расширение и протокол разбирает сама регулярка
+    return _MARKDOWN_LINK_RE.sub(_replace_markdown_link, line)
 
 
 def remove_bare_urls(line: str) -> str:
@@ -753,16 +1058,23 @@ def remove_bare_urls(line: str) -> str:
     - "http://example.com" → "example.com"
     - "www.example.com" → "www.example.com"
     
+    Шаблон не пересекает границы строк, поэтому функцию можно применять
+    сразу к фрагменту документа из нескольких строк.
+    
     Параметры:
-        line: Строка markdown
+        line: Строка markdown (или несколько строк, соединённых '\\n')
         
     Возвращает:
         Строку с заменёнными URL без протокола
     """
+    # Без "://" в тексте протокола быть не может - регулярку не запускаем
+    if '://' not in line:
+        return line
+    
     # Паттерны для различных типов URL
     # https:// или http:// URL - убираем протокол
     # Захватываем всё кроме пробелов и закрывающей скобки
-    line = re.sub(r'https?://([^\s)]+)', r'\1', line)
+    line = _BARE_URL_RE.sub(r'\1', line)
     
     return line
 
@@ -788,34 +1100,22 @@ def quote_operators_in_lists(line: str) -> str:
     Возвращает:
         Строку с операторами в кавычках
     """
+    # Каждый оператор содержит '>', '=' или '?' - без них искать нечего
+    if '>' not in line and '=' not in line and '?' not in line:
+        return line
+    
     # Проверяем, что это НЕ блок кода
-    if line.strip().startswith('```'):
+    if _FENCE_RE.match(line):
         return line
     
     # Проверяем, что это НЕ markdown-цитата (начинается с "> ")
-    if re.match(r'^\s*>\s+', line):
+    if _BLOCKQUOTE_LINE_RE.match(line):
         return line
     
-    # Оборачиваем операторы в кавычки
-    # Паттерны для различных операторов
-    operators = [
-        r'->',      # стрелка
-        r'->>',     # двойная стрелка
-        r'@>',      # оператор содержания
-        r'\?',      # оператор существования
-        r'<=',      # меньше или равно
-        r'>=',      # больше или равно
-        r'!=',      # не равно
-    ]
-    
-    for op in operators:
-        # Ищем оператор в строке (не только в списках)
-        # Паттерн: начало строки или пробел, затем оператор, затем пробел или тире
-        pattern = r'(\s|^)(' + op + r')(\s*—\s*|\s+)'
-        replacement = r'\1"\2"\3'
-        line = re.sub(pattern, replacement, line)
-    
-    return line
+    # Оборачиваем операторы в кавычки за один проход
+    # Ищем оператор в строке (не только в списках)
+    # Паттерн: начало строки или пробел, затем оператор, затем пробел или тире
+    return _OPERATOR_RE.sub(r'\1"\2"', line)
 
 
 def remove_blockquotes(line: str) -> str:
@@ -839,11 +1139,20 @@ def remove_blockquotes(line: str) -> str:
     """
     # Убираем только markdown-цитаты: строки, начинающиеся с "> " (больше + пробел)
     # НЕ трогаем операторы типа ->, ->>, @>, <=, >=, !=
-    line = re.sub(r'^(\s*>\s+)+', '', line)
+    if not line.lstrip().startswith('>'):
+        return line
+    line = _BLOCKQUOTE_PREFIX_RE.sub('', line)
     
     return line
 
 
+def _replace_html_tag(match: re.Match) -> str:
+    """Замена для _HTML_TAG_RE: содержимое тега с разметкой markdown (или без неё)"""
+    name = match.lastgroup
+    markup = _HTML_TAG_MARKUP[name]
+    return f"{markup}{match.group(name + '_text')}{markup}"
+
+
 def remove_html_tags(line: str) -> str:
     """
     Удаляет простые HTML теги, оставляя их содержимое
@@ -854,19 +1163,182 @@ def remove_html_tags(line: str) -> str:
     Возвращает:
         Строку без HTML тегов
     """
+    # Для парного тега нужны два '<'
+    tag_count = line.count('<')
+    if tag_count < 2:
+        return line
+    
+    # Одна пара тегов: совпадение возможно только одно, и после его замены
+    # '<' в строке не остаётся, поэтому один проход объединённого шаблона
+    # даёт тот же результат, что и пять последовательных
+    if tag_count == 2:
+        return _HTML_TAG_RE.sub(_replace_html_tag, line)
+    
+    # Несколько тегов: замена одного может открыть совпадение для следующего
+    # шаблона ("<i><b>x</b></i>"), поэтому применяем шаблоны по очереди
     # Удаляем теги <b>, <i>, <strong>, <em> и прочие простые теги
-    line = re.sub(r'<b>([^<]+)</b>', r'**\1**', line, flags=re.IGNORECASE)
-    line = re.sub(r'<i>([^<]+)</i>', r'*\1*', line, flags=re.IGNORECASE)
-    line = re.sub(r'<strong>([^<]+)</strong>', r'**\1**', line, flags=re.IGNORECASE)
-    line = re.sub(r'<em>([^<]+)</em>', r'*\1*', line, flags=re.IGNORECASE)
+    line = _HTML_B_RE.sub(r'**\1**', line)
+    line = _HTML_I_RE.sub(r'*\1*', line)
+    line = _HTML_STRONG_RE.sub(r'**\1**', line)
+    line = _HTML_EM_RE.sub(r'*\1*', line)
     
     # Удаляем прочие простые теги, оставляя содержимое
-    line = re.sub(r'<([a-z]+)>([^<]+)</\1>', r'\2', line, flags=re.IGNORECASE)
+    line = _HTML_SIMPLE_TAG_RE.sub(r'\2', line)
     
     return line
 
 
-def simplify_markdown_file(input_path: Path, output_path: Path, encoding: str = 'utf-8') -> None:
+def split_code_blocks(lines: List[str]) -> Iterator[Tuple[bool, List[str]]]:
+    """
+    Разбивает документ на фрагменты: блоки кода и обычный текст между ними
+    
+    Строки-ограничители (```) относятся к блоку кода: их, как и содержимое
+    блока, преобразования не трогают.
+    
+    Ограничители ищутся одним проходом регулярки по всему тексту документа,
+    а фрагменты выдаются срезами списка - без проверки каждой строки в цикле.
+    
+    Параметры:
+        lines: Список строк документа (без символов перевода строки)
+        
+    Возвращает:
+        Последовательность пар (это_блок_кода, строки_фрагмента)
+    """
+    text = '\n'.join(lines)
+    total = len(lines)
+    
+    # Номера строк-ограничителей по порядку
+    fences = []
+    line_no = 0
+    pos = 0
+    for match in _FENCE_LINE_RE.finditer(text):
+        line_no += text.count('\n', pos, match.start())
+        pos = match.start()
+        fences.append(line_no)
+    
+    # Блоки кода: от открывающего ограничителя до закрывающего включительно
+    # (незакрытый блок идёт до конца документа). Соседние блоки склеиваются
+    code_ranges = []
+    for k in range(0, len(fences), 2):
+        begin = fences[k]
+        end = fences[k + 1] + 1 if k + 1 < len(fences) else total
+        if code_ranges and code_ranges[-1][1] == begin:
+            code_ranges[-1][1] = end
+        else:
+            code_ranges.append([begin, end])
+    
+    start = 0
+    for begin, end in code_ranges:
+        if begin > start:
+            yield False, lines[start:begin]
+        yield True, lines[begin:end]
+        start = end
+    if start < total:
+        yield False, lines[start:]
+
+
+def _prepare_line(line: str) -> Optional[str]:
+    """
+    Построчные преобразования, выполняемые до удаления протоколов из URL
+    
+    Параметры:
+        line: Строка markdown вне блока кода
+        
+    Возвращает:
+        Преобразованную строку или None, если строку нужно удалить
+    """
+    # Удаляем бессмысленные заголовки "Показать ответ" (остались от <summary>)
+    line = remove_show_answer_headers(line)
+    if line is None:  # Строка удалена - сообщаем об этом вызывающему
+        return None
+    
+    # Обычный текст без разметки не меняется ни одним преобразованием ниже
+    if not _NEEDS_PROCESSING_RE.search(line):
+        return line
+    
+    # Нормализуем заголовки и убираем чек-листы, затем
+    # ИСПРАВЛЕНИЕ: убираем жирное в списках с двоеточием и backticks
+    # в списках с тире/двоеточием (для editor.js) - одним сопоставлением
+    line = fix_line_start(line)
+    
+    # ИСПРАВЛЕНИЕ: убираем ВСЁ жирное форматирование и код (`текст`) в списках
+    # (editor.js теряет текст)
+    line = remove_bold_and_code_in_lists(line)
+    
+    # ИСПРАВЛЕНИЕ: добавляем разделитель после эмодзи в начале списка (editor.js теряет текст)
+    line = fix_emoji_at_list_start(line)
+    
+    # ОТКЛЮЧЕНО: Упрощаем смешанное форматирование
+    # (теперь специально используем курсив для технических терминов)
+    # line = simplify_mixed_formatting(line)
+    
+    # Удаляем HTML теги
+    line = remove_html_tags(line)
+    
+    # ИСПРАВЛЕНИЕ: убираем блок-цитаты (>) - editor.js не поддерживает
+    line = remove_blockquotes(line)
+    
+    return line
+
+
+def _finish_line(line: str) -> str:
+    """
+    Построчные преобразования, выполняемые после удаления протоколов из URL
+    
+    Параметры:
+        line: Строка markdown вне блока кода
+        
+    Возвращает:
+        Преобразованную строку
+    """
+    # Обычный текст без разметки не меняется ни одним преобразованием ниже
+    if not _NEEDS_PROCESSING_RE.search(line):
+        return line
+    
+    # ИСПРАВЛЕНИЕ: преобразуем markdown-ссылки [текст](url) → *текст (url)*
+    # ВАЖНО: ДО обёртки технических терминов, чтобы пути не оборачивались в курсив
+    line = convert_markdown_links(line)
+    
+    # ИСПРАВЛЕНИЕ: оборачиваем операторы в кавычки в списках (предотвращает markdown-разметку)
+    line = quote_operators_in_lists(line)
+    
+    # ИСПРАВЛЕНИЕ: убираем ВСЕ inline backticks везде (editor.js создаёт блоки кода)
+    line = remove_inline_code_everywhere(line)
+    
+    # ИСПРАВЛЕНИЕ: оборачиваем технические термины в курсив (editor.js превращает их в код)
+    # НО только если это НЕ путь к изображению
+    line = wrap_technical_terms_in_italic_except_images(line)
+    
+    # ИСПРАВЛЕНИЕ: убираем курсив в нумерованных списках ПОСЛЕ обёртки терминов (editor.js теряет текст)
+    line = remove_italic_in_lists(line)
+    
+    return line
+
+
+def _read_text(path: Path, encoding: str) -> str:
+    """
+    Читает файл целиком и декодирует его
+    
+    Файл отображается в память (mmap), и текст декодируется прямо из
+    отображения - без промежуточной копии содержимого в объект bytes.
+    
+    Параметры:
+        path: Путь к файлу
+        encoding: Кодировка файла
+        
+    Возвращает:
+        Содержимое файла в виде строки
+    """
+    with open(path, 'rb') as f:
+        # Пустой файл отобразить в память нельзя
+        if os.fstat(f.fileno()).st_size == 0:
+            return ''
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return str(mapped, encoding)
+
+
+def simplify_markdown_file(input_path: Path, output_path: Path, encoding: str = 'utf-8',
+                           log_buf: Optional[List[str]] = None) -> None:
     """
     Обрабатывает один markdown файл, применяя все упрощения
     
@@ -874,102 +1346,84 @@ def simplify_markdown_file(input_path: Path, output_path: Path, encoding: str =
         input_path: Путь к исходному файлу
         output_path: Путь для сохранения результата
         encoding: Кодировка файлов (по умолчанию 'utf-8')
+        log_buf: Список для сообщений лога; если не задан, сообщение
+                 выводится сразу
     """
-    # Читаем исходный файл
-    with open(input_path, 'r', encoding=encoding) as f:
-        lines = f.readlines()
-    
-    # Убираем переносы строк для обработки
-    lines = [line.rstrip('\n\r') for line in lines]
-    
-    # Раскрываем блоки details (обрабатываем весь документ сразу)
-    lines = process_details_blocks(lines)
-    
-    # Унифицируем смешанные списки (обрабатываем весь документ сразу)
-    lines = unify_nested_list_types(lines)
+    # Читаем исходный файл целиком (через mmap) и декодируем одним вызовом.
+    # Переводы строк нормализуем так же, как текстовый режим open():
+    # \r\n и \r превращаются в \n
+    text = _read_text(input_path, encoding)
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    
+    # Разбиваем на строки без символов переноса
+    lines = text.split('\n')
+    if lines[-1] == '':
+        lines.pop()  # Перевод строки в конце файла не создаёт новую строку
+    
+    # Раскрываем блоки details и унифицируем смешанные списки. Оба
+    # преобразования потоковые и собираются в один список, по которому
+    # затем одним проходом ищутся блоки кода
+    lines = list(_lists_stream(_details_stream(lines)))
     
-    # Построчная обработка
     processed_lines = []
-    in_code_block = False  # Флаг: находимся ли внутри блока кода
     
-    for line in lines:
-        # Отслеживаем блоки кода (начало/конец ```)
-        if line.strip().startswith('```'):
-            in_code_block = not in_code_block
-            processed_lines.append(line)
-            continue
-        
+    for is_code, block in split_code_blocks(lines):
         # Пропускаем обработку внутри блоков кода
-        if in_code_block:
-            processed_lines.append(line)
-            continue
-        
-        # Удаляем бессмысленные заголовки "Показать ответ" (остались от <summary>)
-        line = remove_show_answer_headers(line)
-        if line is None:  # Если строка удалена (вернулся None), пропускаем
+        if is_code:
+            processed_lines.extend(block)
             continue
         
-        # Нормализуем заголовки
-        line = normalize_headers(line)
-        
-        # Убираем чек-листы
-        line = remove_checklists(line)
-        
-        # ИСПРАВЛЕНИЕ: убираем жирное в списках с двоеточием (для editor.js)
-        line = fix_bold_colon_in_lists(line)
-        
-        # ИСПРАВЛЕНИЕ: убираем backticks в списках с тире/двоеточием (для editor.js)
-        line = fix_code_with_dash_in_lists(line)
-        
-        # ИСПРАВЛЕНИЕ: убираем ВСЁ жирное форматирование в списках (editor.js теряет текст)
-        line = remove_bold_in_lists(line)
-        
-        # ИСПРАВЛЕНИЕ: убираем ВСЁ форматирование кода (`текст`) в списках (editor.js теряет текст)
-        line = remove_code_in_lists(line)
-        
-        # ИСПРАВЛЕНИЕ: добавляем разделитель после эмодзи в начале списка (editor.js теряет текст)
-        line = fix_emoji_at_list_start(line)
-        
-        # ОТКЛЮЧЕНО: Упрощаем смешанное форматирование
-        # (теперь специально используем курсив для технических терминов)
-        # line = simplify_mixed_formatting(line)
-        
-        # Удаляем HTML теги
-        line = remove_html_tags(line)
+        # Построчная обработка: преобразования до удаления протоколов из URL
+        prepared_lines = []
+        for line in block:
+            line = _prepare_line(line)
+            if line is not None:  # None - строка удалена
+                prepared_lines.append(line)
         
-        # ИСПРАВЛЕНИЕ: убираем блок-цитаты (>) - editor.js не поддерживает
-        line = remove_blockquotes(line)
-        
-        # ИСПРАВЛЕНИЕ: убираем протоколы из URL ПЕРЕД преобразованием ссылок
-        line = remove_bare_urls(line)
-        
-        # ИСПРАВЛЕНИЕ: преобразуем markdown-ссылки [текст](url) → *текст (url)*
-        # ВАЖНО: ДО обёртки технических терминов, чтобы пути не оборачивались в курсив
-        line = convert_markdown_links(line)
-        
-        # ИСПРАВЛЕНИЕ: оборачиваем операторы в кавычки в списках (предотвращает markdown-разметку)
-        line = quote_operators_in_lists(line)
-        
-        # ИСПРАВЛЕНИЕ: убираем ВСЕ inline backticks везде (editor.js создаёт блоки кода)
-        line = remove_inline_code_everywhere(line)
-        
-        # ИСПРАВЛЕНИЕ: оборачиваем технические термины в курсив (editor.js превращает их в код)
-        # НО только если это НЕ путь к изображению
-        line = wrap_technical_terms_in_italic_except_images(line)
+        if not prepared_lines:
+            continue
         
-        # ИСПРАВЛЕНИЕ: убираем курсив в нумерованных списках ПОСЛЕ обёртки терминов (editor.js теряет текст)
-        line = remove_italic_in_lists(line)
+        # ИСПРАВЛЕНИЕ: убираем протоколы из URL ПЕРЕД преобразованием ссылок.
+        # Шаблон не выходит за границы строки, поэтому проход выполняется один раз
+        # на весь фрагмент текста, а не отдельным вызовом для каждой строки
+        prepared_lines = remove_bare_urls('\n'.join(prepared_lines)).split('\n')
         
-        processed_lines.append(line)
+        # Построчная обработка: преобразования после удаления протоколов из URL
+        processed_lines.extend(map(_finish_line, prepared_lines))
     
     # Создаем директорию для вывода, если не существует
     output_path.parent.mkdir(parents=True, exist_ok=True)
     
-    # Записываем результат
-    with open(output_path, 'w', encoding=encoding) as f:
-        f.write('\n'.join(processed_lines))
+    # Записываем результат одним кодированием всего текста
+    # (с системным переводом строки, как при записи в текстовом режиме)
+    output_path.write_bytes(os.linesep.join(processed_lines).encode(encoding))
+    
+    message = f"✓ {input_path.name} → {output_path.name}"
+    if log_buf is None:
+        print(message)
+    else:
+        log_buf.append(message)
+
+
+def _simplify_file_logged(input_path: Path, output_path: Path, encoding: str) -> List[str]:
+    """
+    Обрабатывает файл в рабочем процессе и возвращает сообщения лога
+    
+    Процессы пула не пишут в stdout сами: сообщения собираются и выводятся
+    одной записью, без чередования строк разных процессов.
     
-    print(f"✓ {input_path.name} → {output_path.name}")
+    Параметры:
+        input_path: Путь к исходному файлу
+        output_path: Путь для сохранения результата
+        encoding: Кодировка файлов
+        
+    Возвращает:
+        Список сообщений лога
+    """
+    log_buf = []
+    simplify_markdown_file(input_path, output_path, encoding, log_buf)
+    return log_buf
 
 
 def process_directory(source_dir: str, target_dir: str, encoding: str = 'utf-8') -> int:
@@ -987,24 +1441,37 @@ def process_directory(source_dir: str, target_dir: str, encoding: str = 'utf-8')
     source_path = Path(source_dir)
     target_path = Path(target_dir)
     
-    if not source_path.exists():
+    if not source_path.is_dir():
         print(f"⚠ Директория не найдена: {source_dir}")
         return 0
     
-    # Находим все .md файлы
-    md_files = list(source_path.glob('*.md'))
+    # Находим все .md файлы (один проход scandir, без сопоставления с шаблоном)
+    with os.scandir(source_path) as entries:
+        md_files = [Path(entry.path) for entry in entries
+                    if entry.name.endswith('.md') and entry.is_file()]
     
     if not md_files:
         print(f"⚠ Нет .md файлов в: {source_dir}")
         return 0
     
-    count = 0
-    for md_file in md_files:
-        output_file = target_path / md_file.name
-        simplify_markdown_file(md_file, output_file, encoding)
-        count += 1
-    
-    return count
+    # Файлы обрабатываются независимо друг от друга, поэтому распределяем их
+    # по процессам. Сообщения лога собираются из результатов (ошибки
+    # пробрасываются) и выводятся одной записью в stdout - в том числе
+    # при ошибке, для уже обработанных файлов
+    output_files = [target_path / md_file.name for md_file in md_files]
+    workers = min(len(md_files), os.cpu_count() or 1)
+    chunksize = max(1, len(md_files) // (4 * workers))
+    log_buf = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for messages in executor.map(_simplify_file_logged, md_files, output_files,
+                                         repeat(encoding), chunksize=chunksize):
+                log_buf.extend(messages)
+    finally:
+        if log_buf:
+            sys.stdout.write('\n'.join(log_buf) + '\n')
+    
+    return len(md_files)
 
 
 def main():
@@ -1014,9 +1481,6 @@ def main():
     Читает конфигурацию из ss.ini и обрабатывает директории
     согласно настройкам в конфигурационном файле.
     """
-    print("🔧 Split and Simple - Упрощение Markdown документов для editor.js")
-    print("=" * 70)
-    
     # Инициализируем менеджер конфигурации
     config_manager = ConfigManager('ss.ini')
     
@@ -1045,6 +1509,9 @@ encoding = utf-8
     # Получаем кодировку
     encoding = config_manager.get_encoding()
     
+    # Заголовок выводим только когда есть что обрабатывать
+    print("🔧 Split and Simple - Упрощение Markdown документов для editor.js")
+    print("=" * 70)
     print(f"📁 Найдено {len(directories)} пар директорий для упрощения")
     print(f"🔤 Кодировка файлов: {encoding}")
     print()
@@ -1077,31 +1544,33 @@ encoding = utf-8
     print(f"   Всего упрощено файлов: {total_files}")
     print("=" * 70)
     
-    # Дополнительная информация о применённых преобразованиях
-    print()
-    print("Применённые преобразования:")
-    print("  • Все заголовки приведены к уровню 3 (###)")
-    print("  • Чек-листы превращены в обычные списки")
-    print("  • Раскрыты выпадающие блоки <details>/<summary>")
-    print("  • Унифицированы смешанные списки (вложенные списки того же типа, что родитель)")
-    print("  • Удалены заголовки 'Показать ответ' (остались от <summary>)")
-    print("  • Убраны блок-цитаты (> текст → текст) - editor.js не поддерживает")
-    print("  • Преобразованы markdown-ссылки ([текст](url) → *текст (url)*)")
-    print("  • Убраны протоколы из голых URL (https://... → ...)")
-    print("  • Операторы обёрнуты в кавычки (->, ->>, @>, <=, >=, !=)")
-    print("  • Исправлены списки с жирным текстом и двоеточием (- **Текст:** ...)")
-    print("  • Исправлены списки с backticks и тире (- `код` — пояснение)")
-    print("  • Убрано ВСЁ жирное форматирование в списках (маркированных + нумерованных)")
-    print("  • Убраны ВСЕ backticks в списках (маркированных + нумерованных)")
-    print("  • Убран курсив в нумерованных списках (1. *текст* → 1. текст)")
-    print("  • Убраны ВСЕ inline backticks везде (`users` → *users*)")
-    print("  • Технические термины обёрнуты в курсив вне списков (users, instructor)")
-    print("  • Добавлено двоеточие после эмодзи в начале списка (- 🔥 текст → - 🔥: текст)")
-    print("  • Удалены простые HTML теги")
-    print()
-    print("Результаты сохранены в:")
-    print("  • " + str(source_dir))
-    print("  • " + str(target_dir))
+    # Дополнительная информация о применённых преобразованиях - только если
+    # хоть один файл был упрощён
+    if total_files > 0:
+        print()
+        print("Применённые преобразования:")
+        print("  • Все заголовки приведены к уровню 3 (###)")
+        print("  • Чек-листы превращены в обычные списки")
+        print("  • Раскрыты выпадающие блоки <details>/<summary>")
+        print("  • Унифицированы смешанные списки (вложенные списки того же типа, что родитель)")
+        print("  • Удалены заголовки 'Показать ответ' (остались от <summary>)")
+        print("  • Убраны блок-цитаты (> текст → текст) - editor.js не поддерживает")
+        print("  • Преобразованы markdown-ссылки ([текст](url) → *текст (url)*)")
+        print("  • Убраны протоколы из голых URL (https://... → ...)")
+        print("  • Операторы обёрнуты в кавычки (->, ->>, @>, <=, >=, !=)")
+        print("  • Исправлены списки с жирным текстом и двоеточием (- **Текст:** ...)")
+        print("  • Исправлены списки с backticks и тире (- `код` — пояснение)")
+        print("  • Убрано ВСЁ жирное форматирование в списках (маркированных + нумерованных)")
+        print("  • Убраны ВСЕ backticks в списках (маркированных + нумерованных)")
+        print("  • Убран курсив в нумерованных списках (1. *текст* → 1. текст)")
+        print("  • Убраны ВСЕ inline backticks везде (`users` → *users*)")
+        print("  • Технические термины обёрнуты в курсив вне списков (users, instructor)")
+        print("  • Добавлено двоеточие после эмодзи в начале списка (- 🔥 текст → - 🔥: текст)")
+        print("  • Удалены простые HTML теги")
+        print()
+        print("Результаты сохранены в:")
+        print("  • " + str(source_dir))
+        print("  • " + str(target_dir))
 
 
 if __name__ == '__main__':
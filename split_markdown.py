@@ -13,10 +13,27 @@
 
 import os
 import re
-import configparser
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Dict, Tuple
-from urllib.parse import unquote
+from queue import Queue
+from threading import Thread
+from typing import Iterable, Iterator, List, Dict, Optional, Tuple
+
+
+# Числовой префикс в начале имени файла: "01_intro" -> "01"
+_PREFIX_RE = re.compile(r'^(\d+)')
+
+# Расширения файлов изображений (в нижнем регистре)
+_IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp', '.bmp')
+
+# Ограничитель блока кода (``` или ~~~) после необязательных пробелов
+_FENCE_RE = re.compile(r'\s*(?:```|~~~)')
+
+# Заголовок второго уровня: "## " (после необязательных пробелов) и непустой
+# текст после него. Строка "## " без текста заголовком не считается
+_SECTION_HEADER_RE = re.compile(r'\s*## \s*\S')
 
 
 class ConfigManager:
@@ -35,6 +52,9 @@ class ConfigManager:
             config_file: Путь к файлу конфигурации
         """
         self.config_file = Path(config_file)
+        # configparser нужен только здесь - импорт не замедляет загрузку модуля
+        # в рабочих процессах пула
+        import configparser
         self.config = configparser.ConfigParser()
         
     def load_config(self) -> bool:
@@ -102,6 +122,9 @@ class MarkdownSplitter:
     Использует конечный автомат для парсинга с учетом code blocks.
     """
     
+    # Паттерн для всех markdown ссылок: ![alt](path) или [text](path)
+    _MD_LINK = re.compile(r'(!?)\[([^\]]*)\]\(([^\)]+)\)', re.IGNORECASE)
+    
     def __init__(self, source_dir: str, target_dir: str, encoding: str = 'utf-8'):
         """
         Инициализация сплиттера.
@@ -114,33 +137,53 @@ class MarkdownSplitter:
         self.source_dir = Path(source_dir)
         self.target_dir = Path(target_dir)
         self.encoding = encoding
-        
-    def parse_markdown_file(self, file_path: Path) -> List[List[str]]:
+        # Глубина target относительно source не меняется за время работы -
+        # вычисляем её один раз
+        self._levels_up = self._compute_levels_up()
+        # Префикс "../" нужной глубины для исправляемых путей
+        self._prefix = '../' * self._levels_up
+        # Запись в саму исходную директорию (в том числе через символическую
+        # ссылку) - здесь нужен resolve(): проверка выполняется один раз
+        self._in_place = self.source_dir.resolve() == self.target_dir.resolve()
+        
+    def parse_markdown_file(self, file_path: Path) -> Iterator[List[str]]:
         """
         Парсит Markdown файл и разбивает его на секции по ## заголовкам.
         
         Алгоритм:
         1. Читаем файл построчно (O(n))
         2. Отслеживаем состояние: внутри/снаружи code block
-        3. При обнаружении ## (вне code block) создаем новую секцию
+        3. При обнаружении ## (вне code block) выдаём накопленную секцию
+           и начинаем новую
         4. НЕ сохраняем заголовок первого уровня - чистая разбивка
         
+        Генератор: в памяти находится только текущая секция, а не весь файл.
+        
         Args:
             file_path: Путь к исходному файлу
             
         Returns:
-            List[List[str]]: Список секций (каждая секция - список строк)
+            Iterator[List[str]]: Секции по очереди (каждая секция - список строк)
         """
         with open(file_path, 'r', encoding=self.encoding) as f:
-            lines = f.readlines()
+            yield from self._split_sections(f)
+    
+    def _split_sections(self, lines: Iterable[str]) -> Iterator[List[str]]:
+        """
+        Разбивает поток строк на секции по ## заголовкам (см. parse_markdown_file).
         
-        sections = []
+        Args:
+            lines: Строки документа (с символами перевода строки)
+            
+        Returns:
+            Iterator[List[str]]: Непустые секции по очереди
+        """
         current_section = []
         in_code_block = False
         
         for line in lines:
             # Отслеживаем code blocks (``` или ~~~)
-            if line.strip().startswith('```') or line.strip().startswith('~~~'):
+            if _FENCE_RE.match(line):
                 in_code_block = not in_code_block
                 current_section.append(line)
                 continue
@@ -151,23 +194,22 @@ class MarkdownSplitter:
                 continue
             
             # Проверяем на заголовок второго уровня (но не третьего и выше)
-            if line.strip().startswith('## ') and not line.strip().startswith('### '):
-                # Сохраняем предыдущую секцию (если есть и не пустая)
+            if _SECTION_HEADER_RE.match(line):
+                # Выдаём предыдущую секцию (если есть и не пустая)
                 if current_section and any(l.strip() for l in current_section):
-                    sections.append(current_section)
+                    yield current_section
                 
                 # Начинаем новую секцию с заголовка ##
                 current_section = [line]
             else:
                 current_section.append(line)
         
-        # Сохраняем последнюю секцию (если не пустая)
+        # Выдаём последнюю секцию (если не пустая)
         if current_section and any(l.strip() for l in current_section):
-            sections.append(current_section)
-        
-        return sections
+            yield current_section
     
-    def save_sections(self, sections: List[List[str]], file_prefix: str, source_filename: str) -> List[str]:
+    def save_sections(self, sections: Iterable[List[str]], file_prefix: str, source_filename: str,
+                      log_buf: Optional[List[str]] = None) -> List[str]:
         """
         Сохраняет секции в отдельные файлы.
         
@@ -181,26 +223,74 @@ class MarkdownSplitter:
         Также обновляет относительные пути к изображениям для корректной работы
         в новой директории (например, ./image.svg → ../image.svg).
         
+        Секции могут приходить из генератора: каждая записывается на диск,
+        как только получена. Целевая директория создаётся при первой секции.
+        Запись выполняет отдельный поток (_writer_loop): пока он пишет файл,
+        следующая секция уже разбирается и готовится.
+        
         Args:
-            sections: Список секций (каждая - список строк)
+            sections: Секции (каждая - список строк), список или итератор
             file_prefix: Префикс исходного файла (например, "01", "04")
             source_filename: Имя исходного файла для лога
+            log_buf: Список для сообщений лога; если не задан, сообщения
+                выводятся сразу
             
         Returns:
             List[str]: Список путей созданных файлов
         """
-        # Создаем целевую директорию, если не существует
-        self.target_dir.mkdir(parents=True, exist_ok=True)
-        
         # Вычисляем количество уровней вложенности для корректировки путей
         levels_up = self.calculate_path_adjustment()
         
         created_files = []
         
+        # Готовые файлы передаются потоку записи через ограниченную очередь:
+        # разбор не уходит далеко вперёд записи и не копит секции в памяти
+        queue = Queue(maxsize=4)
+        errors = []
+        writer = Thread(target=self._writer_loop, args=(queue, errors), daemon=True)
+        writer.start()
+        try:
+            self._queue_sections(sections, file_prefix, source_filename, levels_up,
+                                 queue, errors, created_files, log_buf)
+        finally:
+            queue.put(None)
+            writer.join()
+        
+        # Ошибка записи пробрасывается вызывающему, как при записи в этом потоке
+        if errors:
+            raise errors[0]
+        
+        return created_files
+    
+    def _queue_sections(self, sections: Iterable[List[str]], file_prefix: str, source_filename: str,
+                        levels_up: int, queue: Queue, errors: List[Exception],
+                        created_files: List[str], log_buf: Optional[List[str]]) -> None:
+        """
+        Готовит секции к записи и передаёт их в очередь потока записи.
+        
+        Args:
+            sections: Секции (каждая - список строк), список или итератор
+            file_prefix: Префикс исходного файла (например, "01", "04")
+            source_filename: Имя исходного файла для лога
+            levels_up: Количество уровней для корректировки путей
+            queue: Очередь потока записи
+            errors: Ошибки потока записи (непустой список - прекращаем работу)
+            created_files: Список, в который добавляются пути созданных файлов
+            log_buf: Список для сообщений лога; если не задан, сообщения
+                выводятся сразу
+        """
         # Подсчитываем общее количество исправленных путей
         total_paths_fixed = 0
         
         for idx, section in enumerate(sections, start=1):
+            # Запись уже завершилась ошибкой - дальше не продолжаем
+            if errors:
+                return
+            
+            # Создаем целевую директорию, если не существует
+            if idx == 1:
+                self.target_dir.mkdir(parents=True, exist_ok=True)
+            
             # Формируем имя файла: {префикс}_{номер}.md
             filename = f"{file_prefix}_{idx:02d}.md"
             file_path = self.target_dir / filename
@@ -217,18 +307,50 @@ class MarkdownSplitter:
             if paths_fixed_in_section > 0:
                 total_paths_fixed += paths_fixed_in_section
             
-            # Сохраняем содержимое
+            # Сохраняем содержимое: текст кодируется один раз целиком и пишется
+            # потоком записи в двоичном режиме, минуя построчный буфер текстового файла.
+            # Переводы строк приводятся к системным, как при записи в режиме 'w'
             content = ''.join(adjusted_section)
-            with open(file_path, 'w', encoding=self.encoding) as f:
-                f.write(content)
+            if os.linesep != '\n':
+                content = content.replace('\n', os.linesep)
+            queue.put((file_path, content.encode(self.encoding)))
             
             created_files.append(str(file_path))
-            print(f"✓ {source_filename} → {file_prefix}_{idx:02d}.md" + 
-                  (f" ({paths_fixed_in_section} путей исправлено)" if paths_fixed_in_section > 0 else ""))
+            message = (f"✓ {source_filename} → {file_prefix}_{idx:02d}.md" +
+                       (f" ({paths_fixed_in_section} путей исправлено)" if paths_fixed_in_section > 0 else ""))
+            if log_buf is None:
+                print(message)
+            else:
+                log_buf.append(message)
+    
+    @staticmethod
+    def _writer_loop(queue: Queue, errors: List[Exception]) -> None:
+        """
+        Поток записи: сохраняет файлы из очереди, пока не получит None.
         
-        return created_files
+        После первой ошибки файлы больше не пишутся, но очередь продолжает
+        опустошаться, чтобы разбирающий поток не заблокировался на put().
+        
+        Args:
+            queue: Очередь пар (путь, содержимое в байтах) с None в конце
+            errors: Список, в который добавляется ошибка записи
+        """
+        while True:
+            item = queue.get()
+            if item is None:
+                return
+            if errors:
+                continue
+            file_path, data = item
+            try:
+                with open(file_path, 'wb') as f:
+                    f.write(data)
+            except Exception as e:
+                errors.append(e)
     
-    def extract_file_prefix(self, filename: str) -> str:
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def extract_file_prefix(filename: str) -> str:
         """
         Извлекает префикс из имени файла.
         
@@ -247,7 +369,7 @@ class MarkdownSplitter:
         name_without_ext = Path(filename).stem
         
         # Ищем паттерн: цифры в начале строки
-        match = re.match(r'^(\d+)', name_without_ext)
+        match = _PREFIX_RE.match(name_without_ext)
         
         if match:
             return match.group(1)
@@ -256,6 +378,17 @@ class MarkdownSplitter:
             return name_without_ext[:2]
     
     def calculate_path_adjustment(self) -> int:
+        """
+        Возвращает количество уровней вложенности для корректировки путей.
+        
+        Значение вычисляется один раз при создании сплиттера (_compute_levels_up).
+        
+        Returns:
+            int: Количество уровней, на которые target глубже source (0 если на том же уровне)
+        """
+        return self._levels_up
+    
+    def _compute_levels_up(self) -> int:
         """
         Вычисляет количество уровней вложенности для корректировки путей.
         
@@ -266,23 +399,25 @@ class MarkdownSplitter:
         Returns:
             int: Количество уровней, на которые target глубже source (0 если на том же уровне)
         """
-        # Приводим пути к абсолютным для корректного сравнения
-        source_absolute = self.source_dir.resolve()
-        target_absolute = self.target_dir.resolve()
-        
-        # Получаем части пути как список
-        source_parts = source_absolute.parts
-        target_parts = target_absolute.parts
-        
-        # Считаем общее количество частей пути, которые не совпадают
-        # Если target вложен в source, то target имеет больше частей
-        if len(target_parts) > len(source_parts):
-            # Проверяем, является ли source родителем target
-            if target_parts[:len(source_parts)] == source_parts:
-                # Возвращаем разницу в уровнях
-                return len(target_parts) - len(source_parts)
-        
-        return 0
+        # Относительный путь от source к target считается по строкам
+        # (без resolve(), который обходит каждый компонент пути через lstat)
+        try:
+            relative = os.path.relpath(self.target_dir, self.source_dir)
+        except ValueError:
+            # Windows: пути на разных дисках
+            return 0
+        
+        # Тот же каталог
+        if relative == os.curdir:
+            return 0
+        
+        # Если target вложен в source, путь состоит только из спусков вниз;
+        # любой ".." означает, что target лежит вне source
+        parts = relative.split(os.sep)
+        if os.pardir in parts:
+            return 0
+        
+        return len(parts)
     
     def is_image_path(self, path: str) -> bool:
         """
@@ -294,9 +429,8 @@ class MarkdownSplitter:
         Returns:
             bool: True если путь ведет к изображению
         """
-        image_extensions = ('.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp', '.bmp')
-        path_lower = path.lower()
-        return any(path_lower.endswith(ext) for ext in image_extensions)
+        # str.endswith принимает кортеж суффиксов - проверка за один вызов
+        return path.lower().endswith(_IMAGE_EXTENSIONS)
     
     def adjust_relative_path(self, line: str, levels_up: int) -> str:
         """
@@ -324,51 +458,88 @@ class MarkdownSplitter:
         if levels_up == 0:
             return line
         
+        # Любая markdown-ссылка содержит "](" - без него регулярку не запускаем
+        if '](' not in line:
+            return line
+        
         result = line
         
-        # Паттерн для всех markdown ссылок: ![alt](path) или [text](path)
-        markdown_link_pattern = re.compile(r'(!?)\[([^\]]*)\]\(([^\)]+)\)', re.IGNORECASE)
+        # Префикс строится один раз на строку, а для глубины сплиттера
+        # берётся готовый из __init__
+        prefix = self._prefix if levels_up == self._levels_up else '../' * levels_up
         
         def replace_link(match):
             is_image = match.group(1) == '!'  # Начинается с ! значит это изображение
             alt_or_text = match.group(2)
             old_path = match.group(3).strip()
             
-            # Проверяем, не является ли путь абсолютным или URL (для всех)
+            # Ссылки НЕ на изображения никогда не меняются - выходим сразу,
+            # не проверяя префиксы пути
+            if not (is_image or self.is_image_path(old_path)):
+                return match.group(0)
+            
+            # Проверяем, не является ли путь абсолютным или URL
             if old_path.startswith('http://') or old_path.startswith('https://'):
                 return match.group(0)
             if old_path.startswith('/'):
                 return match.group(0)
             
-            # Проверяем, является ли путь путем к изображению
-            if is_image or self.is_image_path(old_path):
-                # Для изображений нужно исправить путь ./ на ../ при разбивке
-                if old_path.startswith('./'):
-                    # Убираем ./ и добавляем ../
-                    file_path = old_path[2:]  # убираем ./
-                    new_path = '../' * levels_up + file_path
-                    return f'{match.group(1)}[{alt_or_text}]({new_path})'
-                # Если уже начинается с ../, не трогаем
-                if old_path.startswith('../'):
-                    return match.group(0)
-                # Если просто имя файла без префикса, добавляем ../
-                new_path = '../' * levels_up + old_path
+            # Для изображений нужно исправить путь ./ на ../ при разбивке
+            if old_path.startswith('./'):
+                # Убираем ./ и добавляем ../
+                file_path = old_path[2:]  # убираем ./
+                new_path = prefix + file_path
                 return f'{match.group(1)}[{alt_or_text}]({new_path})'
-            
-            # Для НЕ-изображений: не трогаем, если уже есть ./ или ../
+            # Если уже начинается с ../, не трогаем
             if old_path.startswith('../'):
                 return match.group(0)
-            if old_path.startswith('./'):
-                return match.group(0)
-            
-            # Это относительный путь к НЕ-изображению БЕЗ ./ или ../ в начале
-            # Для НЕ-изображений не корректируем пути
-            return match.group(0)
+            # Если просто имя файла без префикса, добавляем ../
+            new_path = prefix + old_path
+            return f'{match.group(1)}[{alt_or_text}]({new_path})'
         
-        result = markdown_link_pattern.sub(replace_link, result)
+        result = self._MD_LINK.sub(replace_link, result)
         
         return result
     
+    def _process_files(self, md_files: List[Path]) -> Tuple[int, List[str]]:
+        """
+        Разбивает файлы по секциям, обрабатывая их по порядку.
+        
+        Сообщения не выводятся, а возвращаются: в рабочих процессах пула
+        вывод собирается и пишется в stdout одной записью.
+        
+        Args:
+            md_files: Список исходных файлов
+            
+        Returns:
+            Tuple[int, List[str]]: Количество сохранённых секций и сообщения лога
+        """
+        total_sections = 0
+        log_buf = []
+        
+        for md_file in md_files:
+            # Парсим файл: секции читаются по одной по мере записи
+            sections = self.parse_markdown_file(md_file)
+            
+            # Если результаты пишутся в ту же директорию, файл нужно прочитать
+            # целиком до записи: секция может перезаписать сам исходный файл
+            if self._in_place:
+                sections = list(sections)
+            
+            # Извлекаем префикс файла
+            file_prefix = self.extract_file_prefix(md_file.name)
+            
+            # Сохраняем секции (сообщения добавляются внутри save_sections)
+            created_files = self.save_sections(sections, file_prefix, md_file.name, log_buf)
+            
+            if not created_files:
+                log_buf.append(f"⚠️  {md_file.name} - нет секций уровня ##")
+                continue
+            
+            total_sections += len(created_files)
+        
+        return total_sections, log_buf
+    
     def process_directory(self) -> None:
         """
         Обрабатывает все .md файлы в исходной директории.
@@ -378,33 +549,40 @@ class MarkdownSplitter:
         print(f"Целевая директория: {self.target_dir}")
         print(f"{'='*60}\n")
         
-        # Находим все .md файлы только в корне директории (не во вложенных)
-        md_files = [f for f in self.source_dir.iterdir() 
-                   if f.is_file() and f.suffix == '.md']
+        # Находим все .md файлы только в корне директории (не во вложенных).
+        # scandir отдаёт тип записи вместе с именем, без отдельного stat на файл.
+        # Имя ".md" не подходит: у такого файла нет расширения (Path.suffix == '')
+        with os.scandir(self.source_dir) as entries:
+            md_files = [Path(entry.path) for entry in entries
+                        if len(entry.name) > 3 and entry.name.endswith('.md') and entry.is_file()]
         
         if not md_files:
             print(f"⚠️  В {self.source_dir} не найдено .md файлов")
             return
         
-        total_sections = 0
-        
+        # Файлы с одинаковым префиксом пишут секции в одни и те же имена
+        # ({префикс}_NN.md), поэтому они обрабатываются вместе и по порядку -
+        # как и при последовательной обработке, побеждает последний файл
+        groups: Dict[str, List[Path]] = {}
         for md_file in sorted(md_files):
-            # Парсим файл
-            sections = self.parse_markdown_file(md_file)
-            
-            if not sections:
-                print(f"⚠️  {md_file.name} - нет секций уровня ##")
-                continue
-            
-            # Извлекаем префикс файла
-            file_prefix = self.extract_file_prefix(md_file.name)
-            
-            # Сохраняем секции (вывод происходит внутри save_sections)
-            created_files = self.save_sections(sections, file_prefix, md_file.name)
-            
-            total_sections += len(sections)
-            
-            # print(f"✓ {md_file.name} → {len(sections)} файлов ({file_prefix}_01.md - {file_prefix}_{len(sections):02d}.md)")
+            groups.setdefault(self.extract_file_prefix(md_file.name), []).append(md_file)
+        
+        # Группы независимы - распределяем их по процессам. Сообщения лога
+        # собираются из результатов и выводятся одной записью - в том числе
+        # при ошибке, для уже обработанных групп
+        workers = min(len(groups), os.cpu_count() or 1)
+        chunksize = max(1, len(groups) // (4 * workers))
+        total_sections = 0
+        log_buf = []
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for sections_count, messages in executor.map(self._process_files, groups.values(),
+                                                             chunksize=chunksize):
+                    total_sections += sections_count
+                    log_buf.extend(messages)
+        finally:
+            if log_buf:
+                sys.stdout.write('\n'.join(log_buf) + '\n')
         
         print(f"\n{'='*60}")
         print(f"✅ ЗАВЕРШЕНО")
@@ -420,9 +598,6 @@ def main():
     Читает конфигурацию из ss.ini и обрабатывает директории
     согласно настройкам в конфигурационном файле.
     """
-    print("🔧 Split and Simple - Разбивка Markdown файлов")
-    print("=" * 60)
-    
     # Инициализируем менеджер конфигурации
     config_manager = ConfigManager('ss.ini')
     
@@ -451,6 +626,9 @@ encoding = utf-8
     # Получаем кодировку
     encoding = config_manager.get_encoding()
     
+    # Заголовок выводим только когда есть что обрабатывать
+    print("🔧 Split and Simple - Разбивка Markdown файлов")
+    print("=" * 60)
     print(f"📁 {len(directories)} пар директорий, кодировка: {encoding}")
     
     total_processed = 0